@@ -0,0 +1,83 @@
+"""
+On-disk cache for Yahoo Finance responses
+Lets repeated runs within the same session skip refetching unchanged data
+"""
+
+import os
+import pickle
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '.cache')
+
+# US regular session in exchange time (market holidays are not modelled)
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+TRADING_HOURS_TTL = 60 * 60        # 1 hour while prices are moving
+OFF_HOURS_TTL = 12 * 60 * 60       # 12 hours when markets are closed
+
+def is_trading_hours(now=None):
+    """Check if the US market is in its regular session"""
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+def next_open(now=None):
+    """Return the start of the next regular session strictly after now"""
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    day = now.date()
+    while True:
+        candidate = datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TZ)
+        if candidate > now and candidate.weekday() < 5:
+            return candidate
+        day += timedelta(days=1)
+
+def default_ttl(now=None):
+    """Cache lifetime in seconds for an entry written at now"""
+    now = (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+    if is_trading_hours(now):
+        # Intraday prices must not outlive the close, or the end-of-day run would reuse them
+        boundary = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ)
+        ttl = TRADING_HOURS_TTL
+    else:
+        # Pre-open or previous-close prices must not outlive the next open
+        boundary = next_open(now)
+        ttl = OFF_HOURS_TTL
+    return min(ttl, (boundary - now).total_seconds())
+
+class FileCache:
+    """Pickle-backed cache storing one file per key, expired at a time fixed when written"""
+
+    def __init__(self, cache_dir=CACHE_DIR, suffix='info', ttl=None):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key.lower()}_{self.suffix}.pkl")
+
+    def get(self, key):
+        """Return cached value for key, or None if missing, expired or from another day"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                cached_date, expires_at, value = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, ValueError, TypeError):
+            return None
+        if time.time() >= expires_at or cached_date != datetime.now(timezone.utc).date():
+            return None
+        return value
+
+    def set(self, key, value):
+        """Store value for key, stamped with today's date and its expiry time"""
+        now = datetime.now(timezone.utc)
+        ttl = self.ttl if self.ttl is not None else default_ttl(now)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((now.date(), now.timestamp() + ttl, value), f)
+        os.replace(tmp_path, path)
@@ -5,29 +5,60 @@ Fetches latest REIT and ETF data from Yahoo Finance
 Run: python3 scripts/fetch_data.py
 """
 
+import csv
 import json
+import logging
 import os
-from datetime import datetime
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 import yfinance as yf
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from cache import FileCache
 
 # Configuration
 DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'public', 'data')
+HISTORY_DIR = os.path.join(DATA_DIR, 'histories')
 REIT_TICKERS = ['AGNC', 'NLY', 'ARR', 'ORC', 'TWO']
 ETF_TICKERS = ['JEPI', 'QYLD', 'XYLD', 'DIVO', 'SPYD', 'SDIV', 'PGX', 'SPHD', 'DRIP', 'REM', 'MORT', 'IWM', 'EWZ', 'HDVB']
+MAX_WORKERS = 16
+
+info_cache = FileCache()
+
+logger = logging.getLogger(__name__)
 
-def log(message):
-    """Print timestamped log message"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] {message}")
+def write_json(path, obj):
+    """Write obj as indented JSON, using orjson when available"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2)
 
 def fetch_stock_info(ticker):
-    """Fetch stock info from Yahoo Finance using yfinance"""
-    output_file = os.path.join(DATA_DIR, f"{ticker.lower()}_info.csv")
+    """Fetch stock info from Yahoo Finance using yfinance; returns the extracted dict or None"""
     try:
-        log(f"  Fetching info for {ticker}...")
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = info_cache.get(ticker)
+        if info is not None:
+            logger.info("  Using cached info for %s", ticker)
+        else:
+            logger.info("  Fetching info for %s...", ticker)
+            # yfinance pools one session (and cookie/crumb) across all Ticker objects,
+            # so no shared session is passed in; newer releases reject plain requests sessions
+            stock = yf.Ticker(ticker)
+            info = stock.info
+            # Don't let a throttled or partial response stick around until the entry expires
+            if info and (info.get('currentPrice') or info.get('regularMarketPrice')):
+                info_cache.set(ticker, info)
         
         # Extract relevant data
         data = {
@@ -46,58 +77,93 @@ def fetch_stock_info(ticker):
             'marketCap': info.get('marketCap', 0),
         }
         
-        # Save to CSV
-        df = pd.DataFrame([data])
-        df.to_csv(output_file, index=False)
-        log(f"  ✓ Saved {ticker} info")
-        return True
+        logger.info("  ✓ Fetched %s info", ticker)
+        return data
         
     except Exception as e:
-        log(f"  ✗ Error fetching {ticker} info: {e}")
-        return False
+        logger.error("  ✗ Error fetching %s info: %s", ticker, e)
+        return None
+
+def save_info_csv(infos):
+    """Save the raw info rows for all tickers to a single CSV (for debugging)"""
+    output_file = os.path.join(DATA_DIR, 'info.csv')
+    rows = [data for data in infos if data]
+    if not rows:
+        return
+    with open(output_file, 'w', newline='', buffering=1 << 20) as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    logger.info("  ✓ Saved info.csv (%s tickers)", len(rows))
 
-def fetch_historical_data(ticker):
-    """Fetch historical price data from Yahoo Finance"""
-    output_file = os.path.join(DATA_DIR, f"{ticker.lower()}_history.csv")
+def fetch_historical_data(tickers):
+    """Fetch historical price data for all tickers in one batched Yahoo Finance request"""
+    results = {ticker: False for ticker in tickers}
     try:
-        log(f"  Fetching history for {ticker}...")
-        stock = yf.Ticker(ticker)
-        
-        # Get 6 months of daily data
-        hist = stock.history(period='6mo', interval='1d')
-        
-        if hist.empty:
-            log(f"  ✗ No historical data for {ticker}")
-            return False
-        
-        # Reset index to make Date a column
-        hist.reset_index(inplace=True)
-        
-        # Save to CSV
-        hist.to_csv(output_file, index=False)
-        log(f"  ✓ Saved {ticker} history ({len(hist)} days)")
-        return True
+        logger.info("  Fetching history for %s tickers...", len(tickers))
         
+        # Get 6 months of daily data for every ticker in a single download
+        hist_all = yf.download(
+            tickers=tickers,
+            period='6mo',
+            interval='1d',
+            group_by='ticker',
+            auto_adjust=True,
+            # Keep exchange-local timestamps like Ticker.history, so dates stay "YYYY-MM-DD 00:00:00-05:00"
+            ignore_tz=False,
+            threads=True,
+            progress=False,
+        )
     except Exception as e:
-        log(f"  ✗ Error fetching {ticker} history: {e}")
-        return False
-
-def parse_csv(file_path):
-    """Parse CSV file and return dictionary"""
+        logger.error("  ✗ Error fetching history: %s", e)
+        return results
+    
+    frames = []
+    for ticker in tickers:
+        try:
+            if ticker not in hist_all.columns.get_level_values(0):
+                logger.warning("  ✗ No historical data for %s", ticker)
+                continue
+            
+            # Tickers with a shorter history than the others come back as all-NaN rows
+            hist = hist_all[ticker].dropna(how='all')
+            if hist.empty:
+                logger.warning("  ✗ No historical data for %s", ticker)
+                continue
+            
+            # Reset index to make Date a column
+            frames.append(hist.reset_index().assign(ticker=ticker))
+            logger.info("  ✓ Got %s history (%s days)", ticker, len(hist))
+            results[ticker] = True
+            
+        except Exception as e:
+            logger.error("  ✗ Error processing %s history: %s", ticker, e)
+    
+    if not frames:
+        return results
+    
+    # Save every ticker into one Parquet dataset partitioned by ticker, replacing each
+    # ticker's previous partition under a fixed file name so daily commits update it in place
     try:
-        df = pd.read_csv(file_path)
-        return df.to_dict('records')[0] if len(df) > 0 else None
+        table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+        pq.write_to_dataset(
+            table,
+            root_path=HISTORY_DIR,
+            partition_cols=['ticker'],
+            basename_template='part-{i}.parquet',
+            existing_data_behavior='delete_matching',
+        )
+        logger.info("  ✓ Saved history for %s tickers", len(frames))
     except Exception as e:
-        log(f"  ✗ Error parsing {file_path}: {e}")
-        return None
-
-def process_stock_data(ticker, is_reit=False):
-    """Process stock data from CSV"""
-    info_file = os.path.join(DATA_DIR, f"{ticker.lower()}_info.csv")
-    data = parse_csv(info_file)
+        logger.error("  ✗ Error saving history: %s", e)
+        return {ticker: False for ticker in tickers}
     
+    return results
+
+def process_stock_data(ticker, data, is_reit=False):
+    """Process stock data from the dict returned by fetch_stock_info"""
     if not data:
-        log(f"  ✗ No data found for {ticker}")
+        logger.warning("  ✗ No data found for %s", ticker)
         return None
     
     # Get price
@@ -137,30 +203,40 @@ def process_stock_data(ticker, is_reit=False):
         'category': str(category) if category else ('ETF' if not is_reit else '')
     }
     
-    log(f"  ✓ Processed {ticker}: ${result['price']:.2f}, Yield: {result['yield']:.2f}%")
+    logger.info("  ✓ Processed %s: $%.2f, Yield: %.2f%%", ticker, result['price'], result['yield'])
     return result
 
 def get_history_data(ticker):
-    """Get historical price data from CSV"""
+    """Get historical price data from Parquet"""
     try:
-        history_file = os.path.join(DATA_DIR, f"{ticker.lower()}_history.csv")
-        df = pd.read_csv(history_file)
-        
-        # Sort by date
-        df = df.sort_values('Date')
+        # Read only this ticker's partition, sort by date inside Arrow, then pull the two columns out as lists
+        table = pq.read_table(HISTORY_DIR, columns=['Date', 'Close'], filters=[('ticker', '=', ticker)])
+        columns = table.sort_by('Date').to_pydict()
         
         # Convert Date column to string format
-        dates = df['Date'].astype(str).tolist()
-        prices = df['Close'].round(2).tolist()
+        dates = [str(date) for date in columns['Date']]
+        # Missing closes come back from Arrow as None; keep them as JSON null
+        prices = [round(close, 2) if close is not None else None for close in columns['Close']]
         
         return {
             'dates': dates,
             'prices': prices
         }
     except Exception as e:
-        log(f"  ✗ Error getting history for {ticker}: {e}")
+        logger.error("  ✗ Error getting history for %s: %s", ticker, e)
         return {'dates': [], 'prices': []}
 
+def build_ticker_record(ticker, data, is_reit=False):
+    """Build the full record for one ticker: processed info plus its price history"""
+    record = process_stock_data(ticker, data, is_reit=is_reit)
+    if not record:
+        return None
+    
+    record['history'] = get_history_data(ticker)
+    if record['history']['dates']:
+        logger.info("  ✓ %s: %s data points", ticker, len(record['history']['dates']))
+    return record
+
 def is_weekday():
     """Check if today is a weekday (Monday-Friday)"""
     return datetime.now().weekday() < 5
@@ -168,118 +244,98 @@ def is_weekday():
 def calculate_next_update():
     """Calculate next scheduled update time"""
     now = datetime.now()
-    day = now.weekday()  # 0 = Monday, 6 = Sunday
     
-    # Next update is at 21:00 UTC (9 PM)
+    # Next update is at 21:00 UTC (9 PM); if we're past 21:00 today, move to tomorrow
     next_update = now.replace(hour=21, minute=0, second=0, microsecond=0)
-    
-    # If we're past 21:00 today, move to tomorrow
     if now.hour >= 21:
-        next_update = next_update.replace(day=now.day + 1)
+        next_update += timedelta(days=1)
     
     # If next update falls on weekend, move to Monday
-    next_day = next_update.weekday()
-    if next_day == 5:  # Saturday
-        next_update = next_update.replace(day=next_update.day + 2)
-    elif next_day == 6:  # Sunday
-        next_update = next_update.replace(day=next_update.day + 1)
+    while next_update.weekday() >= 5:
+        next_update += timedelta(days=1)
     
     return next_update.isoformat()
 
 def main():
-    log("=" * 60)
-    log("Starting Data Fetch for High Yield Dashboard")
-    log("=" * 60)
+    # Timestamps are only formatted for records that are actually emitted
+    # Only this script logs at INFO; third-party loggers (yfinance) stay at the WARNING default
+    logging.basicConfig(
+        format='[%(asctime)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        stream=sys.stdout,
+    )
+    logger.setLevel(logging.INFO)
+    
+    logger.info("=" * 60)
+    logger.info("Starting Data Fetch for High Yield Dashboard")
+    logger.info("=" * 60)
     
     # Check if today is a weekday
     if not is_weekday():
-        log("⚠ Today is a weekend. Markets are closed.")
-        log("Fetching data anyway for testing purposes...")
+        logger.warning("⚠ Today is a weekend. Markets are closed.")
+        logger.info("Fetching data anyway for testing purposes...")
         # Uncomment the line below to skip weekend fetches in production
         # return
     
     # Ensure data directory exists
     os.makedirs(DATA_DIR, exist_ok=True)
-    log(f"Data directory: {DATA_DIR}")
-    
-    # Fetch REIT data
-    log("\n📊 Fetching REIT data...")
-    log("-" * 60)
-    reit_success = 0
-    for ticker in REIT_TICKERS:
-        info_success = fetch_stock_info(ticker)
-        hist_success = fetch_historical_data(ticker)
-        if info_success and hist_success:
-            reit_success += 1
-    
-    log(f"✓ REITs fetched: {reit_success}/{len(REIT_TICKERS)}")
+    logger.info("Data directory: %s", DATA_DIR)
     
-    # Fetch ETF data
-    log("\n📈 Fetching ETF data...")
-    log("-" * 60)
-    etf_success = 0
-    for ticker in ETF_TICKERS:
-        info_success = fetch_stock_info(ticker)
-        hist_success = fetch_historical_data(ticker)
-        if info_success and hist_success:
-            etf_success += 1
+    # Fetch REIT and ETF data concurrently (network-bound, so threads overlap the waits)
+    logger.info("\n📊 Fetching REIT and ETF data...")
+    logger.info("-" * 60)
+    all_tickers = REIT_TICKERS + ETF_TICKERS
+    results = {ticker: {} for ticker in all_tickers}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # History comes from one batched download; info has no batch endpoint, so fan it out
+        history_future = executor.submit(fetch_historical_data, all_tickers)
+        futures = {executor.submit(fetch_stock_info, ticker): ticker for ticker in all_tickers}
+        for future in as_completed(futures):
+            results[futures[future]]['info'] = future.result()
+        for ticker, success in history_future.result().items():
+            results[ticker]['history'] = success
     
-    log(f"✓ ETFs fetched: {etf_success}/{len(ETF_TICKERS)}")
+    reit_success = sum(1 for t in REIT_TICKERS if results[t]['info'] and results[t]['history'])
+    etf_success = sum(1 for t in ETF_TICKERS if results[t]['info'] and results[t]['history'])
+    logger.info("✓ REITs fetched: %s/%s", reit_success, len(REIT_TICKERS))
+    logger.info("✓ ETFs fetched: %s/%s", etf_success, len(ETF_TICKERS))
+    save_info_csv(results[t]['info'] for t in all_tickers)
     
     # Process data
-    log("\n🔄 Processing data...")
-    log("-" * 60)
-    
-    # Process REITs
-    reits = []
-    for ticker in REIT_TICKERS:
-        data = process_stock_data(ticker, is_reit=True)
-        if data:
-            reits.append(data)
-    
-    # Process ETFs
-    etfs = []
-    for ticker in ETF_TICKERS:
-        data = process_stock_data(ticker, is_reit=False)
-        if data:
-            etfs.append(data)
-    
-    # Get histories
-    log("\n📉 Compiling historical data...")
-    log("-" * 60)
-    reit_histories = {}
-    for ticker in REIT_TICKERS:
-        hist = get_history_data(ticker)
-        if hist['dates']:
-            reit_histories[ticker] = hist
-            log(f"  ✓ {ticker}: {len(hist['dates'])} data points")
+    logger.info("\n🔄 Processing data...")
+    logger.info("-" * 60)
     
-    etf_histories = {}
-    for ticker in ETF_TICKERS:
-        hist = get_history_data(ticker)
-        if hist['dates']:
-            etf_histories[ticker] = hist
-            log(f"  ✓ {ticker}: {len(hist['dates'])} data points")
+    # Build one record per ticker (info + history), then split it for the JSON outputs
+    reits, etfs = [], []
+    reit_histories, etf_histories = {}, {}
+    for tickers, is_reit, items, histories in (
+        (REIT_TICKERS, True, reits, reit_histories),
+        (ETF_TICKERS, False, etfs, etf_histories),
+    ):
+        for ticker in tickers:
+            record = build_ticker_record(ticker, results[ticker]['info'], is_reit=is_reit)
+            if not record:
+                continue
+            history = record.pop('history')
+            items.append(record)
+            if history['dates']:
+                histories[ticker] = history
     
     # Save processed data
-    log("\n💾 Saving JSON files...")
-    log("-" * 60)
+    logger.info("\n💾 Saving JSON files...")
+    logger.info("-" * 60)
     
-    with open(os.path.join(DATA_DIR, 'reits.json'), 'w') as f:
-        json.dump(reits, f, indent=2)
-    log(f"  ✓ Saved reits.json ({len(reits)} items)")
+    write_json(os.path.join(DATA_DIR, 'reits.json'), reits)
+    logger.info("  ✓ Saved reits.json (%s items)", len(reits))
     
-    with open(os.path.join(DATA_DIR, 'etfs.json'), 'w') as f:
-        json.dump(etfs, f, indent=2)
-    log(f"  ✓ Saved etfs.json ({len(etfs)} items)")
+    write_json(os.path.join(DATA_DIR, 'etfs.json'), etfs)
+    logger.info("  ✓ Saved etfs.json (%s items)", len(etfs))
     
-    with open(os.path.join(DATA_DIR, 'reit_histories.json'), 'w') as f:
-        json.dump(reit_histories, f, indent=2)
-    log(f"  ✓ Saved reit_histories.json ({len(reit_histories)} tickers)")
+    write_json(os.path.join(DATA_DIR, 'reit_histories.json'), reit_histories)
+    logger.info("  ✓ Saved reit_histories.json (%s tickers)", len(reit_histories))
     
-    with open(os.path.join(DATA_DIR, 'etf_histories.json'), 'w') as f:
-        json.dump(etf_histories, f, indent=2)
-    log(f"  ✓ Saved etf_histories.json ({len(etf_histories)} tickers)")
+    write_json(os.path.join(DATA_DIR, 'etf_histories.json'), etf_histories)
+    logger.info("  ✓ Saved etf_histories.json (%s tickers)", len(etf_histories))
     
     # Save last update timestamp
     next_update = calculate_next_update()
@@ -294,19 +350,18 @@ def main():
         }
     }
     
-    with open(os.path.join(DATA_DIR, 'last_update.json'), 'w') as f:
-        json.dump(last_update_data, f, indent=2)
-    log(f"  ✓ Saved last_update.json")
+    write_json(os.path.join(DATA_DIR, 'last_update.json'), last_update_data)
+    logger.info("  ✓ Saved last_update.json")
     
     # Summary
-    log("\n" + "=" * 60)
-    log("✅ Data Fetch Complete!")
-    log("=" * 60)
-    log(f"REITs processed: {len(reits)}/{len(REIT_TICKERS)}")
-    log(f"ETFs processed: {len(etfs)}/{len(ETF_TICKERS)}")
-    log(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    log(f"Next update: {datetime.fromisoformat(next_update).strftime('%Y-%m-%d %H:%M:%S UTC')}")
-    log("=" * 60)
+    logger.info("\n" + "=" * 60)
+    logger.info("✅ Data Fetch Complete!")
+    logger.info("=" * 60)
+    logger.info("REITs processed: %s/%s", len(reits), len(REIT_TICKERS))
+    logger.info("ETFs processed: %s/%s", len(etfs), len(ETF_TICKERS))
+    logger.info("Last updated: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logger.info("Next update: %s", datetime.fromisoformat(next_update).strftime('%Y-%m-%d %H:%M:%S UTC'))
+    logger.info("=" * 60)
 
 if __name__ == '__main__':
     main()